@@ -20,13 +20,19 @@
 
 import argparse
 import ast
+import concurrent.futures
+import json
 import warnings
 from typing import List, Mapping, Optional
 
 import urllib3
 from atls import ATLSContext, HTTPAConnection
 from atls.utils.requests import HTTPAAdapter
-from atls.utils.urllib3 import extract_from_urllib3, inject_into_urllib3
+from atls.utils.urllib3 import (
+    HTTPAConnectionPool,
+    extract_from_urllib3,
+    inject_into_urllib3,
+)
 from atls.validators import Validator
 from atls.validators.azure.aas import AciValidator
 from cryptography.x509.oid import ObjectIdentifier
@@ -80,9 +86,9 @@ parser.add_argument(
 parser.add_argument(
     "--headers",
     type=argparse.FileType("r"),
-    help="path to a file containing the string representation of a Python "
-    "dictionary containing the headers to be sent along with the request "
-    "(default: none)",
+    help="path to a file containing a JSON object with the headers to be sent "
+    "along with the request; the string representation of a Python "
+    "dictionary is accepted, too (default: none)",
 )
 
 parser.add_argument(
@@ -99,6 +105,13 @@ parser.add_argument(
     "upgade all HTTPS connections into HTTP/aTLS (default: false)",
 )
 
+parser.add_argument(
+    "--use-pool",
+    action="store_true",
+    help="use a pool of HTTP/aTLS connections that are reused across loops "
+    "(default: false)",
+)
+
 parser.add_argument(
     "--use-requests",
     action="store_true",
@@ -126,13 +139,20 @@ if loops == 0 or loops < 0:
 policy_files: Optional[List[str]] = args.policy
 jkus: Optional[List[str]] = args.jku
 
-# Read in the specified Rego policies, if any.
+
+def read_file(filepath: str) -> str:
+    with open(filepath) as f:
+        return f.read()
+
+
+# Read in the specified Rego policies, if any. The files are read concurrently
+# since they may reside on a high-latency file system (e.g., a network mount).
 policies: Optional[List[str]] = None
 if policy_files is not None:
-    policies = []
-    for filepath in policy_files:
-        with open(filepath) as f:
-            policies.append(f.read())
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(8, len(policy_files) or 1)
+    ) as executor:
+        policies = list(executor.map(read_file, policy_files))
 
 
 class NullValidator(Validator):
@@ -176,7 +196,10 @@ else:
 headers: Mapping[str, str] = {}
 if args.headers is not None:
     raw = args.headers.read()
-    headers = ast.literal_eval(raw)
+    try:
+        headers = json.loads(raw)
+    except json.JSONDecodeError:
+        headers = ast.literal_eval(raw)
 
 # Read in the provided body, if any.
 body: Optional[str] = None
@@ -208,9 +231,26 @@ def use_direct() -> None:
         conn.close()
 
 
+def use_pool() -> None:
+    # Set up a pool of aTLS connections to the server. Unlike in use_direct(),
+    # connections are kept alive and reused across loops, so the cost of
+    # attestation is only incurred when a new connection is established.
+    pool = HTTPAConnectionPool(args.server, args.port, validators=[validator])
+
+    for _ in range(loops):
+        response = pool.request(
+            args.method, args.url, body=body, headers=headers
+        )
+
+        print(f"Status: {response.status}")
+        print(f"Response: {response.data.decode()}")
+
+    pool.close()
+
+
 def use_injection() -> None:
     # Replace urllib3's default HTTPSConnection class with HTTPAConnection.
-    inject_into_urllib3([validator])
+    handle = inject_into_urllib3([validator])
 
     for _ in range(loops):
         # The rest of urllib3's usage is as usual.
@@ -225,7 +265,7 @@ def use_injection() -> None:
         print(f"Response: {response.data.decode()}")
 
     # Restore the default HTTPSConnection class.
-    extract_from_urllib3()
+    extract_from_urllib3(handle)
 
 
 def use_requests() -> None:
@@ -258,6 +298,8 @@ def use_requests() -> None:
 
 if args.use_requests:
     use_requests()
+elif args.use_pool:
+    use_pool()
 elif args.use_injection:
     use_injection()
 else:
@@ -1,7 +1,34 @@
-from atls.atls_context import ATLSContext
-from atls.httpa_connection import HTTPAConnection
+"""
+Attested TLS (aTLS) for Python.
+
+ATLSContext and HTTPAConnection are imported lazily, on first access, because
+they pull in PyOpenSSL and urllib3. As such, importing a subpackage only, such
+as atls.validators, does not incur the cost of importing those dependencies.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from atls.atls_context import ATLSContext
+    from atls.httpa_connection import HTTPAConnection
 
 __all__ = [
     "HTTPAConnection",
     "ATLSContext",
 ]
+
+_modules_by_name = {
+    "ATLSContext": "atls.atls_context",
+    "HTTPAConnection": "atls.httpa_connection",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _modules_by_name:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_modules_by_name[name]), name)
+    globals()[name] = value
+
+    return value
@@ -1,23 +1,31 @@
 import base64
-import secrets
+import concurrent.futures
+import copy
+import functools
+import os
 import socket
 import ssl
 import warnings
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import OpenSSL.crypto
 import OpenSSL.SSL
+from atls.validators import Validator
 from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
-from cryptography.x509.extensions import Extension, ExtensionType
+from cryptography.x509 import UnrecognizedExtension, load_der_x509_certificate
+from cryptography.x509.oid import ObjectIdentifier
+from urllib3.util import wait_for_read
 
 # TODO/HEGATTA: Either take the code from urllib3 that wraps PyOpenSSL or ditch
 # PyOpenSSL altogether in favor of either modifying Python's SSL module to
 # support custom certificate validation or switching to mbedTLS (and
 # contributing support for custom certificate validation there).
-warnings.filterwarnings("ignore", category=DeprecationWarning)
-from atls.validators import Validator  # noqa: E402
-from urllib3.contrib.pyopenssl import PyOpenSSLContext  # noqa: E402
-from urllib3.contrib.pyopenssl import WrappedSocket  # noqa: E402
+#
+# urllib3 warns that its PyOpenSSL module is deprecated upon import. Silence
+# that warning only, rather than all deprecation warnings in the process.
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    from urllib3.contrib.pyopenssl import PyOpenSSLContext, WrappedSocket
 
 
 class ATLSContext(PyOpenSSLContext):
@@ -25,7 +33,9 @@ class ATLSContext(PyOpenSSLContext):
     An SSL context that supports validation of aTLS certificates.
 
     Attention: Because this class manages the aTLS handshake's nonce, you must
-    use different instances for different connections.
+    use different instances for different connections. Instances obtained via
+    _fork() share the underlying OpenSSL context with the instance they were
+    forked from, which avoids rebuilding it for every connection.
 
     Parameters
     ----------
@@ -40,27 +50,69 @@ class ATLSContext(PyOpenSSLContext):
         A random string of bytes to use as a nonce to ascertain the freshness
         of attestation evidence and mitigate replay attacks. If None, a random
         nonce is automatically generated.
+
+    resume_sessions : bool, optional
+        Whether to resume the TLS session previously established with the same
+        peer, if any. A resumed session skips the certificate exchange and
+        therefore attestation, so the freshness of the evidence is that of the
+        handshake that established the session, not that of the nonce. Off by
+        default.
+
+    prefer_tls13 : bool, optional
+        Whether to negotiate TLS 1.3 if the peer supports it, which saves a
+        round-trip per handshake. TLS 1.2 remains the minimum version. If
+        False, only TLS 1.2 is used. On by default.
     """
 
     def __init__(
-        self, validators: List[Validator], nonce: Optional[bytes] = None
+        self,
+        validators: List[Validator],
+        nonce: Optional[bytes] = None,
+        resume_sessions: bool = False,
+        prefer_tls13: bool = True,
     ) -> None:
-        super().__init__(ssl.PROTOCOL_TLSv1_2)
+        if prefer_tls13:
+            super().__init__(ssl.PROTOCOL_TLS_CLIENT)
+            self.minimum_version = ssl.TLSVersion.TLSv1_2
+        else:
+            super().__init__(ssl.PROTOCOL_TLSv1_2)
 
         if len(validators) == 0:
             raise ValueError("At least one validator is necessary")
 
         if nonce is None:
-            nonce = secrets.token_bytes(32)
+            nonce = os.urandom(32)
+
+        _prepare_validators(validators)
 
         self._validators = validators
+        self._validators_by_oid: Dict[ObjectIdentifier, List[Validator]] = {}
         self._nonce = nonce
 
+        # To perform aTLS over regular TLS, we use the Server Name Indication
+        # extension to carry the nonce.
+        self._sni = base64.b64encode(nonce)
+
+        # Sessions are keyed by peer address and shared by forked instances.
+        self._resume_sessions = resume_sessions
+        self._sessions: Dict[Any, OpenSSL.SSL.Session] = {}
+
         self._ctx.set_verify(OpenSSL.SSL.VERIFY_PEER, self._verify_certificate)
 
+    def _fork(self) -> "ATLSContext":
+        """
+        Returns a new context with a fresh nonce that shares the underlying
+        OpenSSL context, and therefore its configuration, with this one.
+        """
+        context = copy.copy(self)
+        context._nonce = os.urandom(32)
+        context._sni = base64.b64encode(context._nonce)
+
+        return context
+
+    @staticmethod
     def _verify_certificate(
-        self,
-        _conn: OpenSSL.SSL.Connection,
+        conn: OpenSSL.SSL.Connection,
         x509: OpenSSL.crypto.X509,
         _err_no: int,
         _err_depth: int,
@@ -68,32 +120,131 @@ class ATLSContext(PyOpenSSLContext):
     ) -> bool:
         """OpenSSL certificate validation callback"""
 
-        peer_cert = x509.to_cryptography()
+        # The OpenSSL context may be shared by several forked instances, so
+        # the instance that initiated the handshake is attached to the
+        # connection instead of being bound to this callback, along with the
+        # verdicts reached so far during the handshake.
+        context: ATLSContext
+        verdicts: Dict[bytes, bool]
+        context, verdicts = conn.get_app_data()
+
+        der = OpenSSL.crypto.dump_certificate(
+            OpenSSL.crypto.FILETYPE_ASN1, x509
+        )
+
+        # OpenSSL may invoke this callback more than once for the same
+        # certificate during a handshake (e.g., once to report that it is
+        # self-signed and once more to accept it), so memoize the verdict.
+        # It is not kept beyond the handshake, since the evidence may expire
+        # or the keys that vouch for it may be revoked.
+        verdict = verdicts.get(der)
+        if verdict is None:
+            verdict = context._appraise(der)
+            verdicts[der] = verdict
 
-        for validator in self._validators:
-            extension: Extension[ExtensionType]
-            for extension in peer_cert.extensions:
-                if validator.accepts(extension.oid):
-                    if not hasattr(extension.value, "value"):
-                        continue
+        return verdict
 
-                    document = extension.value.value
-                    pub = peer_cert.public_key()
-                    spki = pub.public_bytes(
-                        Encoding.DER, PublicFormat.SubjectPublicKeyInfo
-                    )
+    def _appraise(self, der: bytes) -> bool:
+        """
+        Returns whether any validator accepts an attestation document in the
+        given ASN.1 DER-encoded X.509 certificate as binding its public key
+        and this context's nonce.
+        """
+        spki, documents = _inspect_certificate(der)
 
-                    if validator.validate(document, spki, self._nonce):
-                        return True
+        candidates: List[Tuple[Validator, bytes]] = []
+        for oid, document in documents:
+            for validator in self._get_validators_for(oid):
+                candidates.append((validator, document))
+
+        # A certificate without an attestation document that some validator
+        # accepts is rejected outright; as the server's certificate is
+        # self-signed, there are no intermediates to let through.
+        if not candidates:
+            return False
+
+        if len(candidates) == 1:
+            validator, document = candidates[0]
+            return validator.validate(document, spki, self._nonce)
+
+        # Validators may block on network I/O (e.g., to fetch keys from an
+        # attestation service), so when more than one applies, they run
+        # concurrently. The executor belongs to this handshake alone: one
+        # shared by every connection forked from a template would serialize
+        # concurrent handshakes behind each other.
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(candidates)
+        )
+        futures = [
+            executor.submit(validator.validate, document, spki, self._nonce)
+            for validator, document in candidates
+        ]
+
+        # Only one validator need succeed, so return as soon as one does
+        # without waiting for the others to finish.
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                if future.result():
+                    return True
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
 
         return False
 
+    def _get_validators_for(self, oid: ObjectIdentifier) -> List[Validator]:
+        """
+        Returns the validators that accept attestation documents contained in
+        a certificate extension with the specified OID. The answer is memoized
+        so that each validator is queried at most once per accepted OID.
+
+        OIDs that no validator accepts are not memoized: the peer chooses
+        them, so remembering them would let it grow the memo without bound.
+        """
+        validators = self._validators_by_oid.get(oid)
+        if validators is None:
+            validators = [v for v in self._validators if v.accepts(oid)]
+            if validators:
+                self._validators_by_oid[oid] = validators
+
+        return validators
+
     def wrap_socket(self, sock: socket.socket) -> WrappedSocket:
-        # To perform aTLS over regular TLS, we use the Server Name Indication
-        # extension to carry the nonce.
-        sni = base64.encodebytes(self._nonce)
+        cnx = OpenSSL.SSL.Connection(self._ctx, sock)
+        cnx.set_app_data((self, {}))
+        cnx.set_tlsext_host_name(self._sni)
+        cnx.set_connect_state()
+
+        if self._resume_sessions:
+            peer = sock.getpeername()
+            session = self._sessions.get(peer)
+            if session is not None:
+                cnx.set_session(session)
+
+        while True:
+            try:
+                cnx.do_handshake()
+            except OpenSSL.SSL.WantReadError as e:
+                if not wait_for_read(sock, sock.gettimeout()):
+                    raise socket.timeout("select timed out") from e
+                continue
+            except OpenSSL.SSL.Error as e:
+                raise ssl.SSLError(f"bad handshake: {e!r}") from e
+            break
+
+        # The verdicts reached during the handshake are only good for it.
+        cnx.set_app_data(None)
+
+        if not self._resume_sessions:
+            return _ATLSWrappedSocket(cnx, sock)
 
-        return super().wrap_socket(sock, False, True, True, sni)
+        self._sessions[peer] = cnx.get_session()
+
+        wrapped = _ATLSWrappedSocket(cnx, sock)
+        wrapped.session_store = (self._sessions, peer)
+
+        return wrapped
 
     @property
     def validators(self) -> List[Validator]:
@@ -101,8 +252,83 @@ class ATLSContext(PyOpenSSLContext):
 
     @validators.setter
     def validators(self, validators: List[Validator]) -> None:
+        _prepare_validators(validators)
+
         self._validators = validators
+        self._validators_by_oid = {}
+        self._sessions = {}
 
     @property
     def nonce(self) -> bytes:
         return self._nonce
+
+    @property
+    def resume_sessions(self) -> bool:
+        return self._resume_sessions
+
+
+class _ATLSWrappedSocket(WrappedSocket):
+    """
+    A wrapped socket that, if session_store is set, saves the connection's
+    session into it upon closing. In TLS 1.3, the session tickets needed for
+    resumption arrive after the handshake, so the session saved right after
+    the handshake may not be resumable yet.
+
+    In that case, the peer is notified before the connection is closed, too,
+    as OpenSSL considers sessions of connections closed without notice to be
+    bad and marks them as not resumable. Otherwise, closing behaves as usual.
+    """
+
+    session_store: Optional[Tuple[Dict[Any, OpenSSL.SSL.Session], Any]] = None
+
+    def _real_close(self) -> None:
+        if self.session_store is not None:
+            sessions, peer = self.session_store
+            sessions[peer] = self.connection.get_session()
+
+            try:
+                self.connection.shutdown()
+            except OpenSSL.SSL.Error:
+                pass
+
+        super()._real_close()
+
+
+def _prepare_validators(validators: List[Validator]) -> None:
+    """
+    Checks that each of the given objects is a Validator, once rather than on
+    every handshake, and prepares it for use.
+    """
+    for validator in validators:
+        if not isinstance(validator, Validator):
+            raise TypeError(f"{validator!r} is not a Validator")
+
+        validator.prepare()
+
+
+@functools.lru_cache(maxsize=64)
+def _inspect_certificate(
+    der: bytes,
+) -> Tuple[bytes, Tuple[Tuple[ObjectIdentifier, bytes], ...]]:
+    """
+    Given an ASN.1 DER-encoded X.509 certificate, returns its public key as a
+    DER-encoded SubjectPublicKeyInfo structure along with the OID and raw
+    contents of each of its extensions that may contain an attestation
+    document. Extensions that the cryptography module recognizes, such as
+    Basic Constraints, cannot and are therefore left out.
+
+    Pooled connections to the same peer present the same certificate over and
+    over, so the results are memoized to avoid parsing it on every handshake.
+    """
+    cert = load_der_x509_certificate(der)
+    spki = cert.public_key().public_bytes(
+        Encoding.DER, PublicFormat.SubjectPublicKeyInfo
+    )
+
+    documents = tuple(
+        (extension.oid, extension.value.value)
+        for extension in cert.extensions
+        if isinstance(extension.value, UnrecognizedExtension)
+    )
+
+    return spki, documents
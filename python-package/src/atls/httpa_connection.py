@@ -1,3 +1,4 @@
+import socket
 from typing import ClassVar, Optional, Tuple
 
 from atls import ATLSContext
@@ -36,11 +37,19 @@ class HTTPAConnection(HTTPConnection):
         remote host, respectively.
 
     socket_options: _TYPE_SOCKET_OPTIONS, optional
-        A sequence of socket options to apply to the socket.
+        A sequence of socket options to apply to the socket. If None, Nagle's
+        algorithm is disabled and TCP keep-alive is enabled, which suits
+        long-lived connections that amortize the cost of the aTLS handshake.
+        Pass an empty sequence to apply no options.
     """
 
     default_port: ClassVar[int] = port_by_scheme["https"]
 
+    default_socket_options: ClassVar[_TYPE_SOCKET_OPTIONS] = [
+        *HTTPConnection.default_socket_options,
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+
     def __init__(
         self,
         host: str,
@@ -51,6 +60,9 @@ class HTTPAConnection(HTTPConnection):
         blocksize: int = 8192,
         socket_options: Optional[_TYPE_SOCKET_OPTIONS] = None,
     ) -> None:
+        if socket_options is None:
+            socket_options = self.default_socket_options
+
         super().__init__(
             host,
             port,
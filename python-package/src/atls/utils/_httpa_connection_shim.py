@@ -1,8 +1,7 @@
-from typing import Any, ClassVar, Dict, List, Optional, Tuple
+from typing import Any, ClassVar, Dict, Optional, Tuple
 
 from atls import ATLSContext
 from atls.httpa_connection import HTTPAConnection
-from atls.validators import Validator
 from urllib3.util.connection import _TYPE_SOCKET_OPTIONS
 from urllib3.util.timeout import _DEFAULT_TIMEOUT, _TYPE_TIMEOUT
 
@@ -11,9 +10,14 @@ class _HTTPAConnectionShim(HTTPAConnection):
     """
     Provides impendance-matching at the interface between urllib3 and the
     HTTPAConnection class.
+
+    Each connection forks the aTLS context given by the template keyword
+    argument or, failing that, by the Template class attribute, so that all
+    connections made from the same template share its underlying OpenSSL
+    context and, if enabled, its TLS sessions.
     """
 
-    Validators: ClassVar[List[Validator]]
+    Template: ClassVar[ATLSContext]
 
     is_verified: bool = True
 
@@ -25,16 +29,34 @@ class _HTTPAConnectionShim(HTTPAConnection):
         source_address: Optional[Tuple[str, int]] = None,
         blocksize: int = 8192,
         socket_options: Optional[_TYPE_SOCKET_OPTIONS] = None,
+        template: Optional[ATLSContext] = None,
         **_kwargs: Dict[str, Any],
     ) -> None:
-        context = ATLSContext(self.Validators)
+        if template is None:
+            template = self.Template
+
+        self._template = template
 
+        # The template itself never performs a handshake: connect() below
+        # replaces it with a fork before every connection attempt.
         super().__init__(
             host,
-            context,
+            self._template,
             port,
             timeout,
             source_address,
             blocksize,
             socket_options,
         )
+
+    def connect(self) -> None:
+        # urllib3 reconnects pooled connections that the server has closed by
+        # calling connect() again on the same object, so fork the template
+        # anew each time to never send the same nonce twice.
+        self._context = self._template._fork()
+
+        super().connect()
+
+        # urllib3 clears is_verified when closing a connection, yet every
+        # connection that completes the aTLS handshake has been attested.
+        self.is_verified = True
@@ -1,59 +1,82 @@
-from typing import Any, Dict, List, Optional, Union
+from types import MappingProxyType
+from typing import Any, Dict, Optional, Sequence, Union
 
-from atls.utils._httpa_connection_shim import _HTTPAConnectionShim
+from atls.utils.urllib3 import HTTPAConnectionPool
 from atls.validators import Validator
-from requests.adapters import (
-    DEFAULT_POOLBLOCK,
-    DEFAULT_POOLSIZE,
-    DEFAULT_RETRIES,
-    HTTPAdapter,
-)
-from urllib3 import HTTPSConnectionPool
-from urllib3.poolmanager import PoolManager
+from requests.adapters import DEFAULT_POOLSIZE, DEFAULT_RETRIES, HTTPAdapter
+from urllib3 import HTTPConnectionPool
+from urllib3.poolmanager import PoolManager, pool_classes_by_scheme
 from urllib3.util.retry import Retry as Retry
 
+# Every new aTLS connection costs a full handshake including attestation, so
+# keep more connections around for reuse than requests does by default and
+# have callers wait for a pooled connection to free up rather than open (and
+# then throw away) extra ones when the pool is exhausted.
+_DEFAULT_POOLMAXSIZE = max(DEFAULT_POOLSIZE, 20)
+_DEFAULT_POOLBLOCK = True
+
+# Shared by all pool managers, so make it read-only.
+_pool_classes_by_scheme = MappingProxyType(
+    {
+        **pool_classes_by_scheme,
+        "httpa": HTTPAConnectionPool,
+    }
+)
+
 
 class _HTTPAPoolManager(PoolManager):
     def __init__(
         self,
-        validators: List[Validator],
+        validators: Sequence[Validator],
         num_pools: int = DEFAULT_POOLSIZE,
         headers: Optional[Dict[Any, Any]] = None,
+        resume_sessions: bool = False,
         **connection_pool_kw: Dict[str, Any],
     ) -> None:
         # This must be called first because it initializes
-        # pool_classes_by_scheme, which we modify below.
+        # pool_classes_by_scheme and key_fn_by_scheme, which we override and
+        # modify below, respectively. The latter is a per-instance copy, so
+        # modifying it does not affect other pool managers.
         super().__init__(num_pools, headers, **connection_pool_kw)
 
-        dyn_connection_type = type(
-            "_HTTPAConnectionShim",
-            (_HTTPAConnectionShim,),
-            {"Validators": validators},
-        )
+        self.validators = validators
+        self.resume_sessions = resume_sessions
 
-        dyn_pool_manager_type = type(
-            "_HTTPAConnectionPool",
-            (HTTPSConnectionPool,),
-            {"ConnectionCls": dyn_connection_type},
-        )
+        self.pool_classes_by_scheme = _pool_classes_by_scheme  # type: ignore
+        self.key_fn_by_scheme["httpa"] = self.key_fn_by_scheme["https"]
 
-        pools_by_scheme = self.pool_classes_by_scheme.copy()  # type: ignore
-        pools_by_scheme["httpa"] = dyn_pool_manager_type
+    def _new_pool(
+        self,
+        scheme: str,
+        host: str,
+        port: int,
+        request_context: Optional[Dict[str, Any]] = None,
+    ) -> HTTPConnectionPool:
+        # All pools of this manager share the same validators, so rather than
+        # making them part of the pool key, hand them straight to the pool,
+        # which builds the context template that its connections share.
+        if scheme == "httpa":
+            if request_context is None:
+                request_context = self.connection_pool_kw.copy()
 
-        self.pool_classes_by_scheme = pools_by_scheme
-        self.key_fn_by_scheme["httpa"] = self.key_fn_by_scheme["https"]
+            request_context["validators"] = self.validators
+            request_context["resume_sessions"] = self.resume_sessions
+
+        return super()._new_pool(scheme, host, port, request_context)
 
 
 class HTTPAAdapter(HTTPAdapter):
     def __init__(
         self,
-        validators: List[Validator],
+        validators: Sequence[Validator],
         pool_connections: int = DEFAULT_POOLSIZE,
-        pool_maxsize: int = DEFAULT_POOLSIZE,
+        pool_maxsize: int = _DEFAULT_POOLMAXSIZE,
         max_retries: Union[Retry, int] = DEFAULT_RETRIES,
-        pool_block: bool = DEFAULT_POOLBLOCK,
+        pool_block: bool = _DEFAULT_POOLBLOCK,
+        resume_sessions: bool = False,
     ) -> None:
         self.validators = validators
+        self.resume_sessions = resume_sessions
 
         super().__init__(
             pool_connections, pool_maxsize, max_retries, pool_block
@@ -63,12 +86,13 @@ class HTTPAAdapter(HTTPAdapter):
         self,
         connections: int,
         maxsize: int,
-        block: bool = DEFAULT_POOLBLOCK,
+        block: bool = _DEFAULT_POOLBLOCK,
         **pool_kwargs: Dict[str, Any],
     ) -> None:
         self.poolmanager = _HTTPAPoolManager(
             validators=self.validators,
             num_pools=connections,
+            resume_sessions=self.resume_sessions,
             maxsize=maxsize,  # type: ignore
             block=block,  # type: ignore
             **pool_kwargs,
@@ -1,3 +1,8 @@
 from atls.utils.urllib3.patch import extract_from_urllib3, inject_into_urllib3
+from atls.utils.urllib3.pool import HTTPAConnectionPool
 
-__all__ = ["inject_into_urllib3", "extract_from_urllib3"]
+__all__ = [
+    "HTTPAConnectionPool",
+    "inject_into_urllib3",
+    "extract_from_urllib3",
+]
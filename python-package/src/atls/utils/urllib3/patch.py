@@ -1,13 +1,17 @@
-from typing import List
+import threading
+from typing import List, Optional, Sequence, Tuple
 
-import urllib3
+from atls import ATLSContext
 from atls.utils._httpa_connection_shim import _HTTPAConnectionShim
 from atls.validators import Validator
+from urllib3.connectionpool import HTTPSConnectionPool
 
+_lock = threading.Lock()
 _orig_urllib3_connection_cls = None
+_injected_templates: List[Tuple[object, ATLSContext]] = []
 
 
-def inject_into_urllib3(validators: List[Validator]) -> None:
+def inject_into_urllib3(validators: Sequence[Validator]) -> object:
     """
     Monkey-patch aTLS support into urllib3.
 
@@ -19,29 +23,61 @@ def inject_into_urllib3(validators: List[Validator]) -> None:
     Injecting aTLS into urllib3 also allows the requests library to use aTLS,
     too.
 
-    Call extract_from_urllib3() to undo the changes made by this function.
+    Call extract_from_urllib3() with the handle that this function returns to
+    undo its changes. Calls may overlap, in which case the validators of the
+    most recent call that has not been undone apply to every aTLS connection
+    in the process, and urllib3 is only restored once every call has been
+    undone. Since the patch is process-wide, prefer HTTPAConnectionPool or
+    HTTPAAdapter where different parts of a program need different
+    validators.
     """
 
+    # All connections made while this call is in effect fork the same
+    # template. A copy of the list is immune to later changes to the caller's.
+    template = ATLSContext(list(validators))
+    handle = object()
+
     global _orig_urllib3_connection_cls
-    _orig_urllib3_connection_cls = (
-        urllib3.connectionpool.HTTPSConnectionPool.ConnectionCls
-    )
+    with _lock:
+        if not _injected_templates:
+            _orig_urllib3_connection_cls = HTTPSConnectionPool.ConnectionCls
+            HTTPSConnectionPool.ConnectionCls = _HTTPAConnectionShim
+
+        _injected_templates.append((handle, template))
+        _HTTPAConnectionShim.Template = template
 
-    _HTTPAConnectionShim.Validators = validators
-    urllib3.connectionpool.HTTPSConnectionPool.ConnectionCls = (
-        _HTTPAConnectionShim
-    )
+    return handle
 
 
-def extract_from_urllib3() -> None:
-    """Undoes the changes made by inject_into_urllib3()."""
+def extract_from_urllib3(handle: Optional[object] = None) -> None:
+    """
+    Undoes the changes made by the call to inject_into_urllib3() that returned
+    the specified handle, or by the most recent call that has not been undone
+    if no handle is given. Undoing a call more than once has no effect.
+    """
 
     global _orig_urllib3_connection_cls
-    if _orig_urllib3_connection_cls is None:
-        return
+    with _lock:
+        if not _injected_templates:
+            return
+
+        if handle is None:
+            _injected_templates.pop()
+        else:
+            for i, (injected, _) in enumerate(_injected_templates):
+                if injected is handle:
+                    del _injected_templates[i]
+                    break
+            else:
+                return
+
+        if _injected_templates:
+            _HTTPAConnectionShim.Template = _injected_templates[-1][1]
+            return
+
+        if _orig_urllib3_connection_cls is not None:
+            HTTPSConnectionPool.ConnectionCls = _orig_urllib3_connection_cls
 
-    urllib3.connectionpool.HTTPSConnectionPool.ConnectionCls = (
-        _orig_urllib3_connection_cls
-    )
+        del _HTTPAConnectionShim.Template
 
-    _orig_urllib3_connection_cls = None
+        _orig_urllib3_connection_cls = None
@@ -0,0 +1,55 @@
+from typing import Any, Optional, Sequence
+
+from atls import ATLSContext
+from atls.utils._httpa_connection_shim import _HTTPAConnectionShim
+from atls.validators import Validator
+from urllib3 import HTTPSConnectionPool
+
+
+class HTTPAConnectionPool(HTTPSConnectionPool):
+    """
+    A urllib3 connection pool whose connections are established over Attested
+    TLS (aTLS). Reusing pooled connections amortizes the cost of attestation
+    across requests to the same host.
+
+    Parameters
+    ----------
+    host : str
+        IP address or hostname to connect to.
+
+    port : int, optional
+        Port to connect to.
+
+    validators : sequence of Validator
+        A list of one or more evidence or attestation result validators with
+        which to appraise the host during each aTLS handshake.
+
+    resume_sessions : bool, optional
+        Whether new connections resume the TLS session established by an
+        earlier one. Resumed handshakes skip attestation; see ATLSContext.
+        Off by default.
+
+    **kwargs
+        Any other keyword arguments that urllib3's HTTPSConnectionPool
+        accepts, such as maxsize and block.
+
+    All connections of the pool share one aTLS context template, and with it
+    the underlying OpenSSL context, but each handshake uses a fresh nonce.
+    """
+
+    ConnectionCls = _HTTPAConnectionShim  # type: ignore
+
+    def __init__(
+        self,
+        host: str,
+        port: Optional[int] = None,
+        *,
+        validators: Sequence[Validator],
+        resume_sessions: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        template = ATLSContext(
+            list(validators), resume_sessions=resume_sessions
+        )
+
+        super().__init__(host, port, template=template, **kwargs)
@@ -1,9 +1,34 @@
-from atls.validators.azure.aas.aci_validator import AciValidator
+"""
+Validators for attestation documents issued by the Azure Attestation Service.
+
+AciValidator is imported lazily, on first access, because it pulls in PyJWT.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
 from atls.validators.azure.aas.cvm_validator import CvmValidator
 from atls.validators.azure.aas.shared import PUBLIC_JKUS
 
+if TYPE_CHECKING:
+    from atls.validators.azure.aas.aci_validator import AciValidator
+
 __all__ = [
     "PUBLIC_JKUS",
     "AciValidator",
     "CvmValidator",
 ]
+
+_modules_by_name = {
+    "AciValidator": "atls.validators.azure.aas.aci_validator",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _modules_by_name:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_modules_by_name[name]), name)
+    globals()[name] = value
+
+    return value
@@ -1,6 +1,9 @@
 from atls.validators import Validator
 from cryptography.x509.oid import ObjectIdentifier
 
+# 1.3.9999.2.1.1 = iso.identified-organization.reserved.azure.aas.cvm
+_OID = ObjectIdentifier("1.3.9999.2.1.1")
+
 
 class CvmValidator(Validator):
     """
@@ -9,10 +12,11 @@ class CvmValidator(Validator):
     (AAS)
     """
 
+    __slots__ = ()
+
     @staticmethod
     def accepts(oid: ObjectIdentifier) -> bool:
-        # 1.3.9999.2.1.1 = iso.identified-organization.reserved.azure.aas.cvm
-        return oid == ObjectIdentifier("1.3.9999.2.1.1")
+        return oid == _OID
 
     def validate(
         self, document: bytes, public_key: bytes, nonce: bytes
@@ -9,6 +9,8 @@ class Validator(ABC):
     attestation result generated by an attester or verifier, respectively.
     """
 
+    __slots__ = ()
+
     @staticmethod
     @abstractmethod
     def accepts(oid: ObjectIdentifier) -> bool:
@@ -19,6 +21,14 @@ class Validator(ABC):
         """
         raise NotImplementedError
 
+    def prepare(self) -> None:
+        """
+        Performs any one-time initialization that the validator may benefit
+        from ahead of the first appraisal, such as fetching keys. Invoked when
+        an ATLSContext is created with this validator, so it may be called more
+        than once. Does nothing by default.
+        """
+
     @abstractmethod
     def validate(
         self, document: bytes, public_key: bytes, nonce: bytes
@@ -0,0 +1,186 @@
+import concurrent.futures
+import datetime
+import socket
+import threading
+import unittest
+from typing import Callable
+
+import OpenSSL.crypto
+import OpenSSL.SSL
+from atls.utils.urllib3 import HTTPAConnectionPool
+from atls.validators import Validator
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID, ObjectIdentifier
+
+try:
+    import requests
+    from atls.utils.requests import HTTPAAdapter
+except ImportError:  # pragma: no cover
+    requests = None
+
+_OID = ObjectIdentifier("1.3.9999.2.1.2")
+_DOCUMENT = b"document"
+
+_CONCURRENCY = 8
+_VALIDATORS = 2
+
+# Generous, so that a loaded machine does not fail the test, while still
+# bounding how long a regression takes to surface.
+_BARRIER_TIMEOUT = 10.0
+
+
+class _BarrierValidator(Validator):
+    """
+    Accepts any document, but only once as many validations as the barrier
+    has parties are under way at the same time.
+    """
+
+    def __init__(self, barrier: threading.Barrier) -> None:
+        self.barrier = barrier
+
+    @staticmethod
+    def accepts(oid: ObjectIdentifier) -> bool:
+        return oid == _OID
+
+    def validate(
+        self, document: bytes, public_key: bytes, nonce: bytes
+    ) -> bool:
+        try:
+            self.barrier.wait()
+        except threading.BrokenBarrierError:
+            return False
+
+        return document == _DOCUMENT
+
+
+def _make_server_context() -> OpenSSL.SSL.Context:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.UnrecognizedExtension(_OID, _DOCUMENT), critical=False
+        )
+        .sign(key, hashes.SHA256())
+    )
+
+    ctx = OpenSSL.SSL.Context(OpenSSL.SSL.TLS_SERVER_METHOD)
+    ctx.use_certificate(OpenSSL.crypto.X509.from_cryptography(cert))
+    ctx.use_privatekey(OpenSSL.crypto.PKey.from_cryptography_key(key))
+
+    return ctx
+
+
+def _serve(ctx: OpenSSL.SSL.Context, listener: socket.socket) -> None:
+    while True:
+        try:
+            sock, _ = listener.accept()
+        except OSError:
+            # The listener was shut down.
+            return
+
+        threading.Thread(
+            target=_respond, args=(ctx, sock), daemon=True
+        ).start()
+
+
+def _respond(ctx: OpenSSL.SSL.Context, sock: socket.socket) -> None:
+    conn = OpenSSL.SSL.Connection(ctx, sock)
+    conn.set_accept_state()
+    try:
+        conn.do_handshake()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += conn.recv(4096)
+        conn.sendall(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Connection: close\r\n"
+            b"Content-Length: 2\r\n\r\nok"
+        )
+        conn.shutdown()
+    except OpenSSL.SSL.Error:
+        pass
+    finally:
+        sock.close()
+
+
+class ConcurrentHandshakeTest(unittest.TestCase):
+    """
+    Handshakes on different connections made from the same pool or adapter
+    must validate attestation documents in parallel rather than queue up:
+    every validation of every handshake must be under way at the same time
+    for any of them to pass.
+    """
+
+    port: int
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(_CONCURRENCY)
+        cls.port = listener.getsockname()[1]
+
+        server = threading.Thread(
+            target=_serve,
+            args=(_make_server_context(), listener),
+            daemon=True,
+        )
+        server.start()
+
+        # Cleanups run in reverse order: shutting the listener down wakes
+        # the server thread up so that it can be joined.
+        cls.addClassCleanup(server.join)
+        cls.addClassCleanup(listener.close)
+        cls.addClassCleanup(listener.shutdown, socket.SHUT_RDWR)
+
+    def setUp(self) -> None:
+        self.barrier = threading.Barrier(
+            _CONCURRENCY * _VALIDATORS, timeout=_BARRIER_TIMEOUT
+        )
+        self.validators = [
+            _BarrierValidator(self.barrier) for _ in range(_VALIDATORS)
+        ]
+
+    def _assert_concurrent(self, get: Callable[[], bytes]) -> None:
+        with concurrent.futures.ThreadPoolExecutor(_CONCURRENCY) as executor:
+            bodies = list(executor.map(lambda _: get(), range(_CONCURRENCY)))
+
+        self.assertFalse(self.barrier.broken)
+        self.assertEqual(bodies, [b"ok"] * _CONCURRENCY)
+
+    def test_pool(self) -> None:
+        pool = HTTPAConnectionPool(
+            "127.0.0.1",
+            self.port,
+            validators=self.validators,
+            maxsize=_CONCURRENCY,
+        )
+        self.addCleanup(pool.close)
+
+        self._assert_concurrent(lambda: pool.request("GET", "/").data)
+
+    @unittest.skipIf(requests is None, "requests is not installed")
+    def test_adapter(self) -> None:
+        session = requests.Session()
+        session.mount(
+            "httpa://",
+            HTTPAAdapter(self.validators, pool_maxsize=_CONCURRENCY),
+        )
+        self.addCleanup(session.close)
+
+        url = f"httpa://127.0.0.1:{self.port}/"
+        self._assert_concurrent(lambda: session.get(url).content)
+
+
+if __name__ == "__main__":
+    unittest.main()